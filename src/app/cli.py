@@ -10,40 +10,73 @@ Commands:
 from __future__ import annotations
 
 import argparse
+import sys
 from pathlib import Path
 
-from src.app.logger import get_logger
-from src.app.uploader import upload_file, InvalidFileTypeError, FileAccessError, UploadError
-from src.app.storage import db
-from src.app.processor import process_file
-from src.app.exceptions import RecordNotFoundError, DecodeError, ProcessingError
+from src.app.exceptions import (
+    InvalidFileTypeError, FileAccessError, UploadError,
+    RecordNotFoundError, ProcessingError
+)
 
-log = get_logger(__name__)
+# uploader / storage / processor are imported inside the command that needs
+# them: they set up logging and load the DB from disk, which `--help` and
+# argument errors should not pay for.
 
 
-def main(argv: list[str] | None = None) -> int:
+def _add_upload_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("path", type=str, help="Path to the file to upload (.txt or .csv).")
+
+
+def _add_list_args(p: argparse.ArgumentParser) -> None:
+    pass
+
+
+def _add_process_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("record_id", type=str, help="Record id to process (use the id shown in 'list').")
+
+
+# command -> (help text, argument builder)
+_COMMANDS = {
+    "upload": ("Upload a file (local path).", _add_upload_args),
+    "list": ("List uploaded records (from in-memory DB).", _add_list_args),
+    "process": ("Process a file by record id (count lines & words).", _add_process_args),
+}
+
+
+def _build_parser(argv: list[str]) -> argparse.ArgumentParser:
+    """
+    Build the parser, adding arguments only for the command being run.
+
+    Every command is still registered (so top-level help and 'invalid choice'
+    errors are unchanged), but only the selected one gets its arguments.
+    """
     parser = argparse.ArgumentParser(
         prog="file-upload-service",
         description="Upload and process files (.txt, .csv) locally."
     )
     sub = parser.add_subparsers(dest="command", required=True)
 
-    # upload
-    p_up = sub.add_parser("upload", help="Upload a file (local path).")
-    p_up.add_argument("path", type=str, help="Path to the file to upload (.txt or .csv).")
+    # first positional token is the command (there are no global options besides -h)
+    selected = next((tok for tok in argv if not tok.startswith("-")), None)
+    for name, (help_text, add_args) in _COMMANDS.items():
+        p = sub.add_parser(name, help=help_text)
+        if name == selected:
+            add_args(p)
+    return parser
 
-    # list
-    sub.add_parser("list", help="List uploaded records (from in-memory DB).")
-
-    # process
-    p_proc = sub.add_parser("process", help="Process a file by record id (count lines & words).")
-    p_proc.add_argument("record_id", type=str, help="Record id to process (use the id shown in 'list').")
 
+def main(argv: list[str] | None = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = _build_parser(argv)
     args = parser.parse_args(argv)
 
     if args.command == "upload":
+        from src.app.uploader import upload_file
+        from src.app.storage import get_db
         try:
-            rec = upload_file(Path(args.path))
+            rec = upload_file(Path(args.path), flush=False)
+            get_db().flush()  # on disk before we report success
             print(f"OK: uploaded '{rec.original_name}' -> id={rec.id} size={rec.size_bytes}B")
             return 0
         except InvalidFileTypeError as e:
@@ -57,7 +90,8 @@ def main(argv: list[str] | None = None) -> int:
             return 4
 
     if args.command == "list":
-        rows = list(db.all())
+        from src.app.storage import get_db
+        rows = get_db().all()  # single-threaded here, so the live view is fine
         if not rows:
             print("(no records yet)")
             return 0
@@ -70,16 +104,18 @@ def main(argv: list[str] | None = None) -> int:
         return 0
 
     if args.command == "process":
+        from src.app.processor import process_file
+        from src.app.storage import get_db
         try:
-            rec = process_file(args.record_id)
+            rec = process_file(args.record_id, flush=False)
+            get_db().flush()  # on disk before we report success
             print(f"OK: processed id={rec.id} -> lines={rec.line_count} words={rec.word_count}")
             return 0
         except RecordNotFoundError as e:
             print(f"ERROR: {e}")
             return 5
-        except DecodeError as e:
-            print(f"ERROR: {e}")
-            return 6
+        # exit code 6 (DecodeError) is retired: files that fail to decode are
+        # counted as raw bytes instead
         except ProcessingError as e:
             print(f"ERROR: {e}")
             return 7
@@ -15,5 +15,20 @@ UPLOADS_DIR: Path = BASE_DIR / "uploads"
 LOGS_DIR: Path = BASE_DIR / "logs"
 DATA_DIR: Path = BASE_DIR / "data"
 
+# Explicit location of the JSON database. None (the default) means
+# DATA_DIR / "db.json", resolved when the DB is opened, so repointing
+# DATA_DIR alone is enough.
+DB_JSON_PATH: Path | None = None
+
+# Buffer size for userspace file copies (uploads), well above the 64 KiB
+# shutil default so large files need far fewer read/write syscalls.
+COPY_BUFSIZE: int = 1024 * 1024
+
 # Allowed file extensions for "uploads" (case-insensitive).
-ALLOWED_EXTENSIONS = {".txt", ".csv"}
\ No newline at end of file
+# Immutable, so it can be shared freely (e.g. across server threads).
+ALLOWED_EXTENSIONS: frozenset[str] = frozenset({".txt", ".csv"})
+
+# Reuse the stored copy when the same source file (same path, mtime and
+# size) is uploaded again in this process, e.g. retries/idempotent ingest.
+# Off by default: every upload_file() call then makes a fresh copy.
+REUSE_UNCHANGED_UPLOADS: bool = False
@@ -13,6 +13,9 @@ class InvalidFileTypeError(UploadError):
 class FileAccessError(UploadError):
     """Raised when a file cannot be accessed (missing, permissions, etc.)."""
 
+class MultipartError(UploadError):
+    """Raised when a multipart/form-data request body is malformed."""
+
 
 # ---- Processing errors ----
 class ProcessingError(Exception):
@@ -2,60 +2,75 @@
 - Provides a single logger setup for console + file logging.
 - Uses a rotating file handler to avoid unbounded log growth.
 - Configure handlers on the ROOT logger so all module loggers work.
+- The root logger only enqueues records; a QueueListener thread does the
+  console/file I/O so callers (e.g. server request threads) never block on disk.
 """
 
 from __future__ import annotations
 
+import atexit
+import functools
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 from src.app import config
 
 _CONFIGURED = False
+_LISTENER: QueueListener | None = None
 _APP_LOGGER_NAME = "file_upload_service"
 
 
 def _configure_root_once() -> None:
-    global _CONFIGURED
+    global _CONFIGURED, _LISTENER
     if _CONFIGURED:
         return
 
-    # Ensure log folder exists
-    config.LOGS_DIR.mkdir(parents=True, exist_ok=True)
-    log_path: Path = config.LOGS_DIR / "app.log"
-
     root = logging.getLogger()      # ROOT LOGGER
     root.setLevel(logging.INFO)
 
-    # Console handler
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.INFO)
-    ch.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    # Avoid duplicate handlers if reloaded; only build (and open) them when needed
+    if not any(isinstance(h, QueueHandler) for h in root.handlers):
+        # Ensure log folder exists
+        if not config.LOGS_DIR.exists():
+            config.LOGS_DIR.mkdir(parents=True, exist_ok=True)
+        log_path: Path = config.LOGS_DIR / "app.log"
+
+        # Console handler
+        ch = logging.StreamHandler()
+        ch.setLevel(logging.INFO)
+        ch.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
 
-    # File handler (rotating)
-    fh = RotatingFileHandler(
-        filename=str(log_path),
-        maxBytes=512_000,
-        backupCount=3,
-        encoding="utf-8",
-    )
-    fh.setLevel(logging.INFO)
-    fh.setFormatter(logging.Formatter(
-        "%(asctime)s %(levelname)s %(name)s: %(message)s"
-    ))
+        # File handler (rotating)
+        fh = RotatingFileHandler(
+            filename=str(log_path),
+            maxBytes=512_000,
+            backupCount=3,
+            encoding="utf-8",
+        )
+        fh.setLevel(logging.INFO)
+        fh.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s: %(message)s"
+        ))
 
-    # Avoid duplicate handlers if reloaded
-    if not any(isinstance(h, RotatingFileHandler) for h in root.handlers):
-        root.addHandler(ch)
-        root.addHandler(fh)
+        # Application threads only append to the queue; the listener thread
+        # formats and writes to the real handlers.
+        q: queue.SimpleQueue = queue.SimpleQueue()
+        root.addHandler(QueueHandler(q))
+        _LISTENER = QueueListener(q, ch, fh, respect_handler_level=True)
+        _LISTENER.start()
+        # stop() drains the queue, so nothing logged before exit is lost
+        atexit.register(_LISTENER.stop)
 
     _CONFIGURED = True
 
 
+@functools.lru_cache(maxsize=None)
 def get_logger(name: str | None = None) -> logging.Logger:
     """
     Get a module logger. Handlers are installed on the ROOT logger once,
     so any module logger will propagate there automatically.
+    Loggers are memoized per name.
     """
     _configure_root_once()
     logger_name = name or _APP_LOGGER_NAME
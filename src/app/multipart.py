@@ -0,0 +1,178 @@
+"""
+streaming multipart/form-data reader (stdlib only, replaces `cgi.FieldStorage`).
+
+Parts are yielded one at a time and their bodies are read straight from the
+request stream, so an upload is never spooled to memory or to a temporary
+file before the caller sees it.
+
+Usage:
+    for part in MultipartReader(rfile, boundary, content_length):
+        if part.name == "file":
+            shutil.copyfileobj(part, dest)
+"""
+
+from __future__ import annotations
+
+from email.message import Message
+from email.parser import HeaderParser
+from email.utils import collapse_rfc2231_value
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from src.app.exceptions import MultipartError
+
+# How much to read from the socket at a time.
+_READ_SIZE = 64 * 1024
+# Upper bound for one part's header block.
+_MAX_HEADER_BYTES = 16 * 1024
+
+
+def parse_content_type(value: str) -> Tuple[str, Optional[str]]:
+    """
+    Split a Content-Type header into (media type, boundary parameter).
+    The boundary is None when absent.
+    """
+    msg = Message()
+    msg["Content-Type"] = value
+    boundary = msg.get_param("boundary")
+    if boundary is not None:
+        boundary = collapse_rfc2231_value(boundary)
+    return msg.get_content_type(), boundary
+
+
+class Part:
+    """One form field. `read()` streams its body from the request."""
+
+    def __init__(self, reader: MultipartReader, headers: Message) -> None:
+        self._reader = reader
+        self.headers = headers
+        name = headers.get_param("name", header="content-disposition")
+        self.name: Optional[str] = collapse_rfc2231_value(name) if name is not None else None
+        self.filename: Optional[str] = headers.get_filename()
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to `size` bytes of the body (all of it if size < 0); b"" at the end."""
+        if size >= 0:
+            return self._reader._read_body(size)
+        chunks = []
+        while chunk := self._reader._read_body(_READ_SIZE):
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+
+class MultipartReader:
+    """
+    Iterate the parts of a multipart/form-data body.
+
+    Each part must be consumed before moving to the next one; whatever the
+    caller leaves unread is skipped automatically.
+
+    Raises:
+        MultipartError if the body is malformed or ends early.
+    """
+
+    def __init__(self, fp: BinaryIO, boundary: str, content_length: int) -> None:
+        self._fp = fp
+        self._remaining = content_length
+        # Every delimiter is preceded by CRLF; seeding the buffer with one
+        # lets the very first delimiter be matched the same way.
+        self._delim = b"\r\n--" + boundary.encode("latin-1")
+        self._buf = bytearray(b"\r\n")
+        self._in_body = True  # the preamble is read like a body and discarded
+
+    def __iter__(self) -> Iterator[Part]:
+        self._skip_body()  # preamble
+        while self._next_part():
+            yield Part(self, self._read_headers())
+            self._skip_body()
+        self.drain()  # epilogue
+
+    def drain(self) -> None:
+        """
+        Read and discard whatever is left of the body, up to Content-Length:
+        the epilogue, or everything unread when the caller stops early (e.g.
+        to reply with an error).
+        """
+        self._buf.clear()
+        while self._fill():
+            self._buf.clear()
+
+    # ---------- buffer helpers ----------
+
+    def _fill(self) -> bool:
+        """Pull the next chunk of the body into the buffer. False once it is exhausted."""
+        if self._remaining <= 0:
+            return False
+        chunk = self._fp.read(min(_READ_SIZE, self._remaining))
+        if not chunk:
+            raise MultipartError("Request body ended before Content-Length was reached.")
+        self._remaining -= len(chunk)
+        self._buf += chunk
+        return True
+
+    def _take(self, n: int) -> bytes:
+        out = bytes(self._buf[:n])
+        del self._buf[:n]
+        return out
+
+    def _read_line(self) -> bytes:
+        while (idx := self._buf.find(b"\r\n")) == -1:
+            if len(self._buf) > _MAX_HEADER_BYTES or not self._fill():
+                raise MultipartError("Malformed multipart body.")
+        line = self._take(idx)
+        del self._buf[:2]
+        return line
+
+    # ---------- parsing steps ----------
+
+    def _read_body(self, size: int) -> bytes:
+        """Return up to `size` bytes of the current body, b"" once its delimiter is reached."""
+        if not self._in_body:
+            return b""
+        scan_from = 0
+        while True:
+            idx = self._buf.find(self._delim, scan_from)
+            if idx == 0:
+                del self._buf[:len(self._delim)]
+                self._in_body = False
+                return b""
+            if idx > 0:
+                return self._take(min(idx, size))
+            # Keep reading until a full chunk can be returned; the last
+            # len(delim) - 1 bytes might be the start of a delimiter.
+            if len(self._buf) < size + len(self._delim):
+                # bytes before this point were searched already
+                scan_from = max(0, len(self._buf) - len(self._delim) + 1)
+                if self._fill():
+                    continue
+            safe = len(self._buf) - (len(self._delim) - 1)
+            if safe > 0:
+                return self._take(min(safe, size))
+            raise MultipartError("Multipart body is missing its closing boundary.")
+
+    def _skip_body(self) -> None:
+        while self._read_body(_READ_SIZE):
+            pass
+
+    def _next_part(self) -> bool:
+        """Consume the rest of the delimiter line. False for the closing '--' delimiter."""
+        while len(self._buf) < 2:
+            if not self._fill():
+                raise MultipartError("Malformed multipart body.")
+        if self._buf.startswith(b"--"):
+            return False
+        self._read_line()  # CRLF, possibly after transport padding
+        return True
+
+    def _read_headers(self) -> Message:
+        lines = []
+        size = 0
+        while line := self._read_line():
+            size += len(line) + 2
+            if size > _MAX_HEADER_BYTES:
+                raise MultipartError("Multipart part headers are too large.")
+            lines.append(line)
+        self._in_body = True
+        # Browsers send non-ASCII filenames as raw UTF-8 rather than RFC 2231
+        # encoded, so decode as UTF-8 (BytesHeaderParser would assume ASCII).
+        block = b"\r\n".join(lines).decode("utf-8", errors="replace")
+        return HeaderParser().parsestr(block + "\r\n\r\n")
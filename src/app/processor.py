@@ -2,7 +2,8 @@
 open stored file, count lines & words, update record.
 
 Design goals:
-- Robust text decoding (try utf-8, utf-8-sig; fallback latin-1; final ignore).
+- Count on raw bytes in one pass (no decode, no per-line lists).
+- Sniff the first bytes for a UTF-16/32 BOM; only those files are decoded.
 - Clear logging at start/end.
 - Update FileRecord with counts and status 'PROCESSED'.
 - User-safe exceptions for common failures.
@@ -10,76 +11,146 @@ Design goals:
 
 from __future__ import annotations
 
+import codecs
+import mmap
 from pathlib import Path
-from typing import Tuple
+from typing import Iterable, Iterator, Optional, Tuple
 
 from src.app.logger import get_logger
-from src.app.storage import db
+from src.app.storage import get_db
 from src.app.models import FileRecord
-from src.app.exceptions import ProcessingError, RecordNotFoundError, DecodeError
+from src.app.exceptions import ProcessingError, RecordNotFoundError
 
 log = get_logger(__name__)
 
 
-def _read_text_robust(path: Path) -> str:
+# Files larger than this are memory-mapped instead of read into memory.
+_MMAP_THRESHOLD_BYTES = 1 << 20
+# Slice size used by the line/word counter.
+_COUNT_CHUNK_BYTES = 1 << 20
+
+# BOMs of encodings that are not ASCII-compatible (UTF-32 first: its LE BOM
+# starts with the UTF-16 LE one).
+_WIDE_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _slices(data: bytes | mmap.mmap) -> Iterator[bytes]:
+    """Yield `data` in _COUNT_CHUNK_BYTES slices (an mmap is paged in lazily)."""
+    for start in range(0, len(data), _COUNT_CHUNK_BYTES):
+        yield data[start:start + _COUNT_CHUNK_BYTES]
+
+
+def _count_chunks(chunks: Iterable[bytes]) -> Tuple[int, int]:
+    """
+    Count lines and words over consecutive byte chunks of one text.
+
+    - Lines: number of b"\\n" bytes, plus one for an unterminated last line.
+      Lone b"\\r", NEL and other Unicode line breaks do not end a line.
+    - Words: runs of bytes that are not ASCII whitespace (like bytes.split()).
+      NBSP (U+00A0), U+3000 and other non-ASCII spaces do not separate words.
+
+    Only one chunk is held at a time, so temporaries stay bounded
+    regardless of file size.
+    """
+    line_count = 0
+    word_count = 0
+    prev_in_word = False
+    last = b""
+    for chunk in chunks:
+        if not chunk:
+            continue  # an incremental decoder may hold back a partial char
+        line_count += chunk.count(b"\n")
+        word_count += len(chunk.split())
+        # a word straddling the chunk boundary was counted twice
+        if prev_in_word and not chunk[:1].isspace():
+            word_count -= 1
+        last = chunk[-1:]
+        prev_in_word = not last.isspace()
+
+    if last and last != b"\n":
+        line_count += 1
+    return line_count, word_count
+
+
+def _count_lines_words(data: bytes | mmap.mmap) -> Tuple[int, int]:
     """
-    Attempt to read text with a few sensible fallbacks.
+    Count lines and words in a single pass over the raw bytes (see
+    _count_chunks for the rules). Nothing is decoded; UTF-16/32 input is
+    transcoded to utf-8 slice by slice first (see _count_buffer).
+    """
+    return _count_chunks(_slices(data))
+
 
-    Order:
-      1) utf-8
-      2) utf-8-sig (handles BOM)
-      3) latin-1
-      4) utf-8 with errors='ignore' (last resort)
+def _transcode(data: bytes | mmap.mmap, encoding: str) -> Iterator[bytes]:
+    """
+    Yield `data` re-encoded from `encoding` to utf-8, one slice at a time.
+    A character split across slices is carried over by the incremental decoder.
 
     Raises:
-        DecodeError if the file cannot be decoded even after fallbacks.
+        UnicodeDecodeError (lazily) if `data` is not valid in `encoding`.
     """
-    # 1) utf-8
-    try:
-        return path.read_text(encoding="utf-8")
-    except UnicodeDecodeError:
-        pass
+    decoder = codecs.getincrementaldecoder(encoding)("strict")
+    for chunk in _slices(data):
+        yield decoder.decode(chunk).encode("utf-8")
+    yield decoder.decode(b"", final=True).encode("utf-8")
 
-    # 2) utf-8-sig
-    try:
-        return path.read_text(encoding="utf-8-sig")
-    except UnicodeDecodeError:
-        pass
 
-    # 3) latin-1
-    try:
-        return path.read_text(encoding="latin-1")
-    except UnicodeDecodeError:
-        pass
+def _sniff_wide_encoding(head: bytes) -> Optional[str]:
+    """Return 'utf-16' / 'utf-32' if `head` starts with their BOM, else None."""
+    for bom, encoding in _WIDE_BOMS:
+        if head.startswith(bom):
+            return encoding
+    return None
 
-    # 4) utf-8 ignore (do not raise here; explicitly last resort)
-    try:
-        return path.read_text(encoding="utf-8", errors="ignore")
-    except Exception as exc:  # extremely rare
-        raise DecodeError(f"Could not decode file: {path.name}") from exc
+
+def _count_buffer(data: bytes | mmap.mmap, path: Path) -> Tuple[int, int]:
+    """
+    Count lines & words of a file's bytes.
+
+    Only the first 4 bytes are inspected to pick the codec. UTF-16/32 files
+    (identified by their BOM) are transcoded to utf-8 slice by slice, so the
+    byte counter sees ASCII-compatible data without the whole file being
+    decoded in memory; everything else is counted as-is. A BOM is only a
+    hint (a latin-1 file may start with "ÿþ"), so data that is not valid in
+    the sniffed encoding is counted again as raw bytes.
+    """
+    encoding = _sniff_wide_encoding(data[:4])
+    if encoding is not None:
+        try:
+            return _count_chunks(_transcode(data, encoding))
+        except UnicodeDecodeError:
+            log.warning("'%s' starts with a %s BOM but is not %s; counting raw bytes",
+                        path.name, encoding, encoding)
+    return _count_lines_words(data)
 
 
-def _count_lines_words(text: str) -> Tuple[int, int]:
+def _count_file(path: Path) -> Tuple[int, int]:
     """
-    Count lines and words in a simple, deterministic way.
+    Count lines & words of a file on disk.
 
-    - Lines: number of newline-separated lines (splitlines()).
-    - Words: whitespace-separated tokens across all lines.
+    Small files are read in one call, where syscall overhead dominates.
+    Larger files are memory-mapped read-only so the counter works on the
+    page cache directly instead of a full userspace copy.
     """
-    lines = text.splitlines()
-    line_count = len(lines)
-    word_count = 0
-    for ln in lines:
-        # split() without args splits on arbitrary whitespace and collapses repeats
-        word_count += len(ln.split())
-    return line_count, word_count
+    if path.stat().st_size <= _MMAP_THRESHOLD_BYTES:
+        return _count_buffer(path.read_bytes(), path)
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mm, "madvise"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        return _count_buffer(mm, path)
 
 
-def process_file(record_id: str) -> FileRecord:
+def process_file(record_id: str, flush: bool = True) -> FileRecord:
     """
-    Process a stored file:
+    Process a stored file (flush=False defers the DB write to the caller):
       - load DB record
-      - read file text robustly
+      - read file bytes (once)
       - count lines & words
       - update record fields + status
       - log start/end
@@ -87,10 +158,10 @@ def process_file(record_id: str) -> FileRecord:
 
     Raises:
         RecordNotFoundError
-        DecodeError
         ProcessingError
     """
     try:
+        db = get_db()
         rec = db.get(record_id)
         if rec is None:
             raise RecordNotFoundError(f"Record not found: {record_id}")
@@ -98,20 +169,19 @@ def process_file(record_id: str) -> FileRecord:
         path: Path = rec.stored_path
         log.info("processing id='%s' file='%s'", rec.id, path.name)
 
-        text = _read_text_robust(path)
-        line_count, word_count = _count_lines_words(text)
+        line_count, word_count = _count_file(path)
 
         rec.line_count = line_count
         rec.word_count = word_count
         rec.status = "PROCESSED"
 
-        db.save(rec)   # <--- persist the updated record
+        db.save(rec, flush=flush)   # <--- persist the updated record
 
         log.info("processed '%s': lines=%d, words=%d", path.name, line_count, word_count)
         return rec
 
-    except (RecordNotFoundError, DecodeError):
-        # These are meaningful and already user-safe
+    except RecordNotFoundError:
+        # meaningful and already user-safe
         raise
 
     except Exception as exc:
@@ -1,10 +1,10 @@
 """
 stdlib HTTP server for uploading and processing files.
 
-- No external frameworks (http.server + cgi only).
+- No external frameworks (http.server + our streaming multipart reader).
 - POST /upload (multipart/form-data, field name 'file'):
     * validates extension (.txt, .csv)
-    * stores a copy via uploader
+    * streams the file part straight into uploads/ via uploader
     * processes it (count lines + words)
     * persists to data/db.json
     * returns JSON { id, original_name, size_bytes, status, line_count, word_count }
@@ -20,32 +20,30 @@ a real framework and stronger security hardening.
 """
 
 from __future__ import annotations
-import warnings
-warnings.filterwarnings("ignore", category=DeprecationWarning, module="cgi")
 
 import io
 import json
 import os
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import cgi
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from typing import Tuple
 
 from src.app.logger import get_logger
-from src.app import config
-from src.app.uploader import upload_file
+from src.app.multipart import MultipartReader, parse_content_type
+from src.app.uploader import store_stream
 from src.app.processor import process_file
-from src.app.storage import db
+from src.app.storage import get_db
 from src.app.exceptions import (
-    InvalidFileTypeError, FileAccessError, UploadError,
-    RecordNotFoundError, DecodeError, ProcessingError
+    InvalidFileTypeError, FileAccessError, MultipartError, UploadError,
+    RecordNotFoundError, ProcessingError
 )
 
 log = get_logger(__name__)
 
 
 def _json_bytes(payload: dict | list, status: int = 200) -> Tuple[int, bytes, str]:
-    data = json.dumps(payload, indent=2).encode("utf-8")
+    # compact output: json only uses its C encoder when indent is None
+    data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
     return status, data, "application/json; charset=utf-8"
 
 
@@ -152,6 +150,15 @@ window.addEventListener('load', refresh);
 </html>
 """
 
+# Processing (read + count) runs on a shared pool sized to the CPU count, so
+# however many uploads the threaded server accepts at once, at most that many
+# counting passes (each holding up to a 1 MiB chunk) run concurrently.
+_PROCESS_POOL = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="process")
+
+# Static responses are encoded once at import instead of on every request.
+_INDEX_RESPONSE = _html_bytes(INDEX_HTML)
+_NOT_FOUND_RESPONSE = _json_bytes({"error": "Not found"}, 404)
+
 
 class Handler(BaseHTTPRequestHandler):
     server_version = "MiniUpload/0.1"
@@ -165,6 +172,31 @@ class Handler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(body)
 
+    def _discard_body(self, length: int) -> None:
+        """
+        Read and drop `length` bytes of unread request body before an error
+        reply. Closing the socket with data still unread makes the kernel
+        reset the connection, and the client would see that instead of our
+        response.
+        """
+        try:
+            while length > 0:
+                chunk = self.rfile.read(min(length, 64 * 1024))
+                if not chunk:
+                    break
+                length -= len(chunk)
+        except OSError:
+            self.close_connection = True
+
+    def _drain(self, reader: MultipartReader | None) -> None:
+        """Like _discard_body(), for a body a MultipartReader has started on."""
+        if reader is None:
+            return
+        try:
+            reader.drain()
+        except (OSError, MultipartError):
+            self.close_connection = True
+
     def do_OPTIONS(self):
         # minimal CORS preflight support if needed
         self.send_response(204)
@@ -175,13 +207,12 @@ class Handler(BaseHTTPRequestHandler):
 
     def do_GET(self):
         if self.path == "/":
-            status, body, ctype = _html_bytes(INDEX_HTML)
-            return self._send(status, body, ctype)
+            return self._send(*_INDEX_RESPONSE)
 
         if self.path == "/records":
-            payload = []
-            for r in db.all():
-                payload.append({
+            # snapshot(): uploads may be saving records on other threads
+            payload = [
+                {
                     "id": r.id,
                     "original_name": r.original_name,
                     "stored_path": str(r.stored_path),
@@ -190,49 +221,53 @@ class Handler(BaseHTTPRequestHandler):
                     "status": r.status,
                     "line_count": r.line_count,
                     "word_count": r.word_count,
-                })
+                }
+                for r in get_db().snapshot()
+            ]
             status, body, ctype = _json_bytes(payload)
             return self._send(status, body, ctype)
 
-        status, body, ctype = _json_bytes({"error": "Not found"}, 404)
-        return self._send(status, body, ctype)
+        return self._send(*_NOT_FOUND_RESPONSE)
 
     def do_POST(self):
         if self.path != "/upload":
-            status, body, ctype = _json_bytes({"error": "Not found"}, 404)
-            return self._send(status, body, ctype)
+            return self._send(*_NOT_FOUND_RESPONSE)
+
+        try:
+            content_length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            content_length = None
 
-        # Parse multipart form
-        ctype, pdict = cgi.parse_header(self.headers.get("Content-Type", ""))
-        if ctype != "multipart/form-data":
+        ctype, boundary = parse_content_type(self.headers.get("Content-Type", ""))
+        if ctype != "multipart/form-data" or not boundary:
+            self._discard_body(content_length or 0)
             status, body, ctype2 = _json_bytes({"error": "Use multipart/form-data"}, 400)
             return self._send(status, body, ctype2)
 
-        form = cgi.FieldStorage(
-            fp=self.rfile,
-            headers=self.headers,
-            environ={
-                "REQUEST_METHOD": "POST",
-                "CONTENT_TYPE": self.headers.get("Content-Type"),
-            }
-        )
-
-        file_item = form["file"] if "file" in form else None
-        if file_item is None or not file_item.filename:
-            status, body, ctype2 = _json_bytes({"error": "Missing file"}, 400)
+        if content_length is None:
+            status, body, ctype2 = _json_bytes({"error": "Missing Content-Length"}, 400)
             return self._send(status, body, ctype2)
 
-        # Save the uploaded stream to a temporary file first
-        tmp_dir = config.UPLOADS_DIR / "_incoming"
-        tmp_dir.mkdir(parents=True, exist_ok=True)
-        tmp_path = tmp_dir / Path(file_item.filename).name
+        # every error reply below drains the body first (see _discard_body)
+        reader = None
         try:
-            with open(tmp_path, "wb") as f:
-                f.write(file_item.file.read())
-
-            # Use our existing uploader + processor
-            rec = upload_file(tmp_path)
-            rec = process_file(rec.id)  # updates counts + status, persists
+            # Stream the 'file' part from the socket straight into uploads/;
+            # every other part is skipped.
+            rec = None
+            reader = MultipartReader(self.rfile, boundary, content_length)
+            for part in reader:
+                if rec is None and part.name == "file" and part.filename:
+                    rec = store_stream(part, part.filename, flush=False)
+
+            if rec is None:
+                status, body, ctype2 = _json_bytes({"error": "Missing file"}, 400)
+                return self._send(status, body, ctype2)
+
+            # The bytes were just written, so this reads from the page cache.
+            rec = _PROCESS_POOL.submit(process_file, rec.id, flush=False).result()  # updates counts + status
+            # both saves above skip the batching policy: persist exactly once,
+            # before the client sees the response
+            get_db().flush()
 
             payload = {
                 "id": rec.id,
@@ -245,23 +280,19 @@ class Handler(BaseHTTPRequestHandler):
             status, body, ctype2 = _json_bytes(payload, 200)
             self._send(status, body, ctype2)
 
-        except (InvalidFileTypeError, FileAccessError) as e:
+        except (InvalidFileTypeError, FileAccessError, MultipartError) as e:
+            self._drain(reader)
             status, body, ctype2 = _json_bytes({"error": str(e)}, 400)
             self._send(status, body, ctype2)
-        except (UploadError, RecordNotFoundError, DecodeError, ProcessingError) as e:
+        except (UploadError, RecordNotFoundError, ProcessingError) as e:
+            self._drain(reader)
             status, body, ctype2 = _json_bytes({"error": str(e)}, 500)
             self._send(status, body, ctype2)
         except Exception:
             log.exception("unexpected failure in /upload")
+            self._drain(reader)
             status, body, ctype2 = _json_bytes({"error": "Unexpected server error"}, 500)
             self._send(status, body, ctype2)
-        finally:
-            # best-effort cleanup of the temporary file
-            try:
-                if tmp_path.exists():
-                    tmp_path.unlink()
-            except Exception:
-                pass
 
     # Route BaseHTTPRequestHandler logs to our app logger instead of stderr
     def log_message(self, format: str, *args) -> None:
@@ -270,7 +301,8 @@ class Handler(BaseHTTPRequestHandler):
 
 
 def run(host: str = "127.0.0.1", port: int = 8000) -> None:
-    server = HTTPServer((host, port), Handler)
+    # one thread per request, so a slow upload no longer blocks other clients
+    server = ThreadingHTTPServer((host, port), Handler)
     log.info("serving on http://%s:%d", host, port)
     try:
         server.serve_forever()
@@ -278,6 +310,7 @@ def run(host: str = "127.0.0.1", port: int = 8000) -> None:
             log.info("shutting down…")
     finally:
             server.server_close()
+            _PROCESS_POOL.shutdown(wait=True)
             log.info("server stopped cleanly")
 
 
@@ -4,16 +4,24 @@ in-memory 'database' with lightweight JSON persistence.
 keep a dict of FileRecord objects in memory, but also mirror them to
 data/db.json so that CLI commands in *separate processes* can see past uploads.
 
-- On import: load from data/db.json if it exists.
-- On save(): write db.json.
-- Also register an atexit flush in case of pending changes.
+- On first use (get_db()): load from data/db.json if it exists. Importing
+  this module touches no files.
+- On save(): mark dirty; db.json is rewritten once _FLUSH_EVERY saves are
+  pending or _FLUSH_INTERVAL seconds have passed since the last write. Both
+  are checked inside save() (there is no background timer), so a lone
+  trailing save stays pending until flush() or exit.
+- flush() forces the write; an atexit flush covers whatever is still pending.
+- reinit() re-points the DB at the configured path (tests repoint config).
 """
 
 from __future__ import annotations
 
 import json
 import atexit
-from datetime import datetime
+import os
+import threading
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, Iterable, Optional
 
@@ -21,47 +29,112 @@ from src.app.models import FileRecord
 from src.app import config
 
 
-_DB_PATH: Path = config.DATA_DIR / "db.json"
+# Coalesce saves: rewrite db.json after this many pending saves...
+_FLUSH_EVERY = 16
+# ...or once this many seconds have passed since the last write.
+_FLUSH_INTERVAL = 1.0
+
+
+def _fsync_dir(folder: Path) -> None:
+    """Persist a rename inside `folder`. No-op where directories can't be opened (Windows)."""
+    try:
+        fd = os.open(folder, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # some filesystems refuse fsync on a directory
+    finally:
+        os.close(fd)
 
 
 class InMemoryDB:
-    def __init__(self) -> None:
-        self._rows: Dict[str, FileRecord] = {}
-        self._dirty: bool = False
-        self._load()
+    def __init__(self, path: Path) -> None:
+        # guards _rows and the flush bookkeeping; the server is multi-threaded
+        self._lock = threading.RLock()
+        self._open(path)
         atexit.register(self._flush_if_dirty)
 
     # ---------- public API ----------
 
-    def save(self, record: FileRecord) -> None:
-        self._rows[record.id] = record
-        self._dirty = True
-        self._flush()  # persist immediately for CLI friendliness
+    def save(self, record: FileRecord, flush: bool = True) -> None:
+        """
+        Store `record`. With flush=True the batching policy may write db.json
+        (checked here, on save, not on a timer); with flush=False it is only
+        marked dirty and the caller is expected to call flush() once it is
+        done (bulk inserts, or a request that flushes before replying).
+        """
+        with self._lock:
+            self._rows[record.id] = record
+            self._dirty = True
+            self._pending += 1
+            if flush and (self._pending >= _FLUSH_EVERY
+                          or time.monotonic() - self._last_flush >= _FLUSH_INTERVAL):
+                self._flush()
 
     def get(self, record_id: str) -> Optional[FileRecord]:
         return self._rows.get(record_id)
 
     def all(self) -> Iterable[FileRecord]:
-        # return a copy-like list to avoid accidental external mutation
-        return list(self._rows.values())
+        """
+        Live, read-only view of the records (no copy).
+        Do not iterate it while other threads may save(); use snapshot() there.
+        """
+        return self._rows.values()
+
+    def snapshot(self) -> list[FileRecord]:
+        """Point-in-time list of the records, safe to iterate from any thread."""
+        with self._lock:
+            return list(self._rows.values())
+
+    def flush(self) -> None:
+        """Write pending changes to db.json now (no-op when nothing changed)."""
+        self._flush_if_dirty()
 
     # ---------- persistence helpers ----------
 
+    def _open(self, path: Path) -> None:
+        """(Re)load the records from `path`, which later flushes write to."""
+        with self._lock:
+            self._path = path
+            self._rows: Dict[str, FileRecord] = {}
+            self._dirty: bool = False
+            self._pending: int = 0
+            self._last_flush: float = time.monotonic()
+            self._load()
+
     def _flush_if_dirty(self) -> None:
-        if self._dirty:
-            self._flush()
+        with self._lock:
+            if self._dirty:
+                self._flush()
 
     def _flush(self) -> None:
-        config.DATA_DIR.mkdir(parents=True, exist_ok=True)
+        # caller holds self._lock
+        self._path.parent.mkdir(parents=True, exist_ok=True)
         data = [self._to_dict(fr) for fr in self._rows.values()]
-        _DB_PATH.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        # No indent: json only uses its C encoder for compact output.
+        payload = json.dumps(data, separators=(",", ":"))
+        # Write a sibling temp file and rename it over db.json, so a crash
+        # mid-write can never leave a truncated database behind. The data is
+        # fsync'ed before the rename (else after a power loss the rename may
+        # be on disk while the data is not), and the folder after it.
+        tmp_path = self._path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path)
+        _fsync_dir(self._path.parent)
         self._dirty = False
+        self._pending = 0
+        self._last_flush = time.monotonic()
 
     def _load(self) -> None:
-        if not _DB_PATH.exists():
+        if not self._path.exists():
             return
         try:
-            items = json.loads(_DB_PATH.read_text(encoding="utf-8"))
+            items = json.loads(self._path.read_text(encoding="utf-8"))
             self._rows = {d["id"]: self._from_dict(d) for d in items}
         except Exception:
             # If the file is corrupted, start fresh (could also log; kept simple here).
@@ -74,7 +147,8 @@ class InMemoryDB:
             "original_name": fr.original_name,
             "stored_path": str(fr.stored_path),
             "size_bytes": fr.size_bytes,
-            "uploaded_at": fr.uploaded_at.isoformat(),
+            # epoch milliseconds: far cheaper to encode/parse than ISO strings
+            "uploaded_at_ms": int(fr.uploaded_at.timestamp() * 1000),
             "status": fr.status,
             "line_count": fr.line_count,
             "word_count": fr.word_count,
@@ -82,17 +156,61 @@ class InMemoryDB:
 
     @staticmethod
     def _from_dict(d: dict) -> FileRecord:
+        if "uploaded_at_ms" in d:
+            uploaded_at = datetime.fromtimestamp(d["uploaded_at_ms"] / 1000, tz=timezone.utc)
+        else:
+            # db.json written before the switch to epoch milliseconds
+            uploaded_at = datetime.fromisoformat(d["uploaded_at"])
         return FileRecord(
             id=d["id"],
             original_name=d["original_name"],
             stored_path=Path(d["stored_path"]),
             size_bytes=int(d["size_bytes"]),
-            uploaded_at=datetime.fromisoformat(d["uploaded_at"]),
+            uploaded_at=uploaded_at,
             status=d.get("status", "UPLOADED"),
             line_count=d.get("line_count"),
             word_count=d.get("word_count"),
         )
 
 
-# module-level singleton
-db = InMemoryDB()
+# module-level singleton, created lazily by get_db()
+_db_instance: Optional[InMemoryDB] = None
+_db_instance_lock = threading.Lock()
+
+
+def _configured_path() -> Path:
+    """config.DB_JSON_PATH if set, else db.json in the current config.DATA_DIR."""
+    if config.DB_JSON_PATH is not None:
+        return config.DB_JSON_PATH
+    return config.DATA_DIR / "db.json"
+
+
+def get_db() -> InMemoryDB:
+    """Return the process-wide DB, loading it from disk on first call."""
+    global _db_instance
+    if _db_instance is None:
+        with _db_instance_lock:
+            if _db_instance is None:
+                _db_instance = InMemoryDB(_configured_path())
+    return _db_instance
+
+
+def reinit() -> None:
+    """
+    Point the process-wide DB at the currently configured path and reload
+    it from there, as a fresh process would. Pending saves are written to
+    the old location first. Cheaper than importlib.reload(storage), and
+    `from src.app.storage import get_db` references stay valid.
+    """
+    with _db_instance_lock:
+        if _db_instance is None:
+            return  # get_db() will read config when first called
+        _db_instance.flush()
+        _db_instance._open(_configured_path())
+
+
+def __getattr__(name: str):
+    # keeps `storage.db` / `from src.app.storage import db` working
+    if name == "db":
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,34 +3,260 @@ file validation + "upload" (copy) + record creation.
 
 This simulates a file upload in a CLI context by copying a local file
 into the app's `uploads/` directory with a unique, safe name.
+The HTTP server instead streams the request body straight into `uploads/`
+via store_stream(), so there is no local source file to copy.
 """
 
 from __future__ import annotations
+import errno
+import logging
+import os
 import shutil
-import uuid
+import stat
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import BinaryIO, Iterable
+
+try:
+    import fcntl  # POSIX only; used for copy-on-write clones
+except ImportError:
+    fcntl = None
 
 from src.app import config
 from src.app.exceptions import InvalidFileTypeError, FileAccessError, UploadError
 from src.app.logger import get_logger
 from src.app.models import FileRecord
-from src.app.storage import db
+from src.app.storage import get_db
 
 
 log = get_logger(__name__)
 
+# Allow-list normalised to lower case once at import, plus its sorted form
+# for error messages (instead of re-sorting on every rejected upload).
+_ALLOWED: frozenset[str] = frozenset(e.lower() for e in config.ALLOWED_EXTENSIONS)
+_ALLOWED_SORTED: tuple[str, ...] = tuple(sorted(_ALLOWED))
+
+# Upload folders this process has already created; keyed by path because
+# config.UPLOADS_DIR may be repointed (tests do).
+_uploads_dir_ready: set[Path] = set()
+
+# Recent uploads keyed by (absolute source path, st_mtime_ns, st_size), for
+# config.REUSE_UNCHANGED_UPLOADS; least recently used entries are evicted.
+_RECENT_MAX = 1024
+_recent_uploads: OrderedDict[tuple[str, int, int], FileRecord] = OrderedDict()
+_recent_lock = threading.Lock()
+
+# Max bytes per os.sendfile() call (Linux caps a single call near 2 GiB).
+_SENDFILE_CHUNK = 1 << 30
+
 
 def is_allowed_file(path: Path) -> bool:
     """
     Return True if the file has an allowed extension (.txt, .csv).
     Case-insensitive.
     """
-    return path.suffix.lower() in config.ALLOWED_EXTENSIONS
+    return _is_allowed(path.suffix.lower())
+
+
+def _is_allowed(suffix: str) -> bool:
+    """`suffix` must already be lower-cased."""
+    return suffix in _ALLOWED
+
+
+def _disallowed_type_error(suffix: str) -> InvalidFileTypeError:
+    return InvalidFileTypeError(
+        f"Extension '{suffix}' is not allowed. "
+        f"Allowed: {list(_ALLOWED_SORTED)}"
+    )
+
+
+def _ensure_uploads_dir() -> Path:
+    """Create config.UPLOADS_DIR once per process instead of on every upload."""
+    uploads_dir = config.UPLOADS_DIR
+    if uploads_dir not in _uploads_dir_ready:
+        uploads_dir.mkdir(parents=True, exist_ok=True)
+        _uploads_dir_ready.add(uploads_dir)
+    return uploads_dir
+
+
+def _recent_upload(key: tuple[str, int, int]) -> FileRecord | None:
+    """Return the record of an earlier upload of this exact file, if it is still stored."""
+    with _recent_lock:
+        record = _recent_uploads.get(key)
+        if record is None:
+            return None
+        # only valid while the DB still holds it and its copy is on disk
+        if get_db().get(record.id) is record and os.path.exists(record.stored_path):
+            _recent_uploads.move_to_end(key)
+            return record
+        del _recent_uploads[key]
+        return None
+
+
+def _remember_upload(key: tuple[str, int, int], record: FileRecord) -> None:
+    with _recent_lock:
+        _recent_uploads[key] = record
+        _recent_uploads.move_to_end(key)
+        if len(_recent_uploads) > _RECENT_MAX:
+            _recent_uploads.popitem(last=False)
+
+
+def _reflink(src_fd: int, dst_fd: int) -> bool:
+    """
+    Clone src_fd's data into dst_fd (FICLONE: copy-on-write, e.g. btrfs/XFS).
+    Only metadata is written and the two files stay independent. Returns
+    False if unsupported (other filesystem, cross-device, Python < 3.12).
+    """
+    ficlone = getattr(fcntl, "FICLONE", None)
+    if ficlone is None:
+        return False
+    try:
+        fcntl.ioctl(dst_fd, ficlone, src_fd)
+        return True
+    except OSError:
+        return False
+
+
+def _fadvise(fd: int, *advice: int) -> None:
+    """Pass access-pattern hints for the whole of fd to the kernel, where supported."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for adv in advice:  # separate calls: the POSIX_FADV_* values are not bitflags
+        try:
+            os.posix_fadvise(fd, 0, 0, adv)
+        except OSError:
+            return  # only a hint; e.g. unsupported on this filesystem
+
+
+def _sendfile_all(src_fd: int, dst_fd: int) -> bool:
+    """
+    Copy all of src_fd into dst_fd with os.sendfile() (in-kernel, no userspace buffer).
+    Returns False, having copied nothing, if sendfile is unsupported for these fds.
+    """
+    if not hasattr(os, "sendfile"):
+        return False
+    offset = 0
+    while True:
+        try:
+            sent = os.sendfile(dst_fd, src_fd, offset, _SENDFILE_CHUNK)
+        except OSError as exc:
+            # e.g. macOS only sends to sockets; fall back before any data moved
+            if offset == 0 and exc.errno in (errno.EINVAL, errno.ENOSYS,
+                                             errno.ENOTSOCK, errno.EOPNOTSUPP):
+                return False
+            raise
+        if sent == 0:
+            return True
+        offset += sent
+
+
+def _copy_into(src: str, dst_fd: int) -> int:
+    """
+    Copy src's data into the open dst_fd; return the bytes written.
+
+    Data is cloned copy-on-write where the filesystem allows it, else goes
+    through os.sendfile() where the platform supports it between regular
+    files (Linux), else through a buffered read/write loop.
+    """
+    src_fd = os.open(src, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        # a clone reads no data, so the read-ahead hints below are only for copies
+        if not _reflink(src_fd, dst_fd):
+            # read once, front to back: prefetch aggressively
+            _fadvise(src_fd, getattr(os, "POSIX_FADV_SEQUENTIAL", 0),
+                     getattr(os, "POSIX_FADV_WILLNEED", 0))
+            if not _sendfile_all(src_fd, dst_fd):
+                with open(src_fd, "rb", closefd=False) as fsrc, \
+                        open(dst_fd, "wb", closefd=False) as fdst:
+                    shutil.copyfileobj(fsrc, fdst, length=config.COPY_BUFSIZE)
+            # the source won't be read again; don't let it crowd the page cache
+            _fadvise(src_fd, getattr(os, "POSIX_FADV_DONTNEED", 0))
+        # fstat the fd we hold rather than re-resolving the destination
+        return os.fstat(dst_fd).st_size
+    finally:
+        os.close(src_fd)
+
+
+def _copy_file(src: str, dest: str) -> int:
+    """Copy a file's data and metadata (like shutil.copy2); return the bytes written."""
+    binary = getattr(os, "O_BINARY", 0)  # Windows: no newline translation
+    dst_fd = os.open(dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | binary, 0o644)
+    try:
+        size_bytes = _copy_into(src, dst_fd)
+    finally:
+        os.close(dst_fd)
+    shutil.copystat(src, dest)
+    return size_bytes
+
+
+def _copy_tmpfile(src: str, dest: str) -> int | None:
+    """
+    Copy src into an unnamed O_TMPFILE in dest's folder and link it in as
+    dest once complete (Linux). Nothing is visible until then, and a crash
+    leaves nothing behind. Returns None, having published nothing, where
+    O_TMPFILE or /proc/self/fd is unavailable.
+    """
+    o_tmpfile = getattr(os, "O_TMPFILE", None)
+    if o_tmpfile is None:
+        return None
+    folder, name = os.path.split(dest)
+    dir_fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        try:
+            dst_fd = os.open(".", o_tmpfile | os.O_WRONLY, 0o644, dir_fd=dir_fd)
+        except OSError:
+            return None  # kernel or filesystem without O_TMPFILE support
+        try:
+            size_bytes = _copy_into(src, dst_fd)
+            # the fd's /proc entry is the only name the file has so far
+            fd_path = f"/proc/self/fd/{dst_fd}"
+            try:
+                shutil.copystat(src, fd_path)
+                # passing a dir fd makes this linkat(AT_SYMLINK_FOLLOW); plain
+                # link() would not follow the /proc entry to the open file
+                os.link(fd_path, name, dst_dir_fd=dir_fd, follow_symlinks=True)
+            except OSError:
+                return None
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(dir_fd)
+    return size_bytes
+
+
+def _materialize(src: str, dest: str) -> int:
+    """
+    Copy src to dest atomically; return the bytes written.
+
+    dest only ever appears complete: the copy is built as an unnamed
+    O_TMPFILE where supported, otherwise as '<dest>.part' that is renamed
+    into place (a crash then leaves at most a stray .part file).
+    """
+    size_bytes = _copy_tmpfile(src, dest)
+    if size_bytes is not None:
+        return size_bytes
+
+    part = dest + ".part"
+    try:
+        size_bytes = _copy_file(src, part)
+        os.replace(part, dest)
+    except BaseException:
+        try:
+            os.unlink(part)
+        except FileNotFoundError:
+            pass
+        raise
+    return size_bytes
 
 
-def upload_file(src_path: Path) -> FileRecord:
+def upload_file(src_path: Path, flush: bool = True) -> FileRecord:
     """
     Validate and copy a file into the local uploads folder.
+    flush=False defers the DB write to the caller (see upload_files_bulk).
+    With config.REUSE_UNCHANGED_UPLOADS, re-uploading a file that has not
+    changed since returns its existing record instead of copying it again.
 
     Steps:
       - ensure file exists and is a regular file
@@ -45,48 +271,152 @@ def upload_file(src_path: Path) -> FileRecord:
         FileAccessError
         UploadError  (generic, user-safe wrapper)
     """
+    # str paths inside the hot path: each Path operation allocates a new object
+    src = os.fspath(src_path)
     try:
-        if not src_path.exists() or not src_path.is_file():
+        # one stat() answers both "exists?" and "regular file?"
+        try:
+            st = os.stat(src)
+        except OSError:
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
+            log.error("cannot access file: %s", src_path)
             raise FileAccessError(f"File not found or not a regular file: {src_path}")
 
-        if not is_allowed_file(src_path):
-            raise InvalidFileTypeError(
-                f"Extension '{src_path.suffix}' is not allowed. "
-                f"Allowed: {sorted(config.ALLOWED_EXTENSIONS)}"
-            )
+        raw_suffix = os.path.splitext(src)[1]
+        suffix = raw_suffix.lower()  # computed once: validation + target name
+        if not _is_allowed(suffix):
+            log.warning("blocked upload for disallowed file type: %s", src_path)
+            raise _disallowed_type_error(raw_suffix)
+
+        # same file, unchanged since we last stored it: skip the copy
+        recent_key = None
+        if config.REUSE_UNCHANGED_UPLOADS:
+            recent_key = (os.path.abspath(src), st.st_mtime_ns, st.st_size)
+            record = _recent_upload(recent_key)
+            if record is not None:
+                return record
 
         # ensure uploads dir exists
-        config.UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
+        uploads_dir = _ensure_uploads_dir()
 
-        # unique target name keeps extension; use uuid4 hex
-        target_name = f"{uuid.uuid4().hex}{src_path.suffix.lower()}"
-        dest_path = config.UPLOADS_DIR / target_name
+        # unique target name keeps extension; 128 random bits as 32 hex chars
+        target_name = f"{os.urandom(16).hex()}{suffix}"
+        dest = os.path.join(uploads_dir, target_name)
 
-        # copy with metadata (copy2)
-        shutil.copy2(src_path, dest_path)
+        # copy data (clone/zero-copy where possible) + metadata, then publish atomically
+        size_bytes = _materialize(src, dest)
 
-        size_bytes = dest_path.stat().st_size
+        original_name = os.path.basename(src)
         record = FileRecord(
             id=target_name,               # simple id = stored filename
-            original_name=src_path.name,
-            stored_path=dest_path,
+            original_name=original_name,
+            stored_path=Path(dest),
             size_bytes=size_bytes,
         )
 
-        db.save(record)
-        log.info("uploaded file '%s' as '%s' (%d bytes)",
-                 src_path.name, dest_path.name, size_bytes)
+        get_db().save(record, flush=flush)
+        if recent_key is not None:
+            _remember_upload(recent_key, record)
+        if log.isEnabledFor(logging.INFO):
+            log.info("uploaded file '%s' as '%s' (%d bytes)",
+                     original_name, target_name, size_bytes)
         return record
 
-    except InvalidFileTypeError:
-        log.warning("blocked upload for disallowed file type: %s", src_path)
-        raise
-
-    except FileAccessError:
-        log.error("cannot access file: %s", src_path)
+    except UploadError:
+        # validation failures, already logged where they were raised
         raise
 
     except Exception as exc:
         # keep internal details in logs; expose a safe message to user
         log.exception("unexpected error while uploading '%s'", src_path)
         raise UploadError("Upload failed due to an unexpected error.") from exc
+
+
+def upload_files_bulk(paths: Iterable[Path]) -> list[FileRecord]:
+    """
+    Upload several files in parallel, writing db.json once at the end
+    instead of per file. Records are returned in input order.
+
+    Uploads are I/O-bound (stat + copy), so a small thread pool overlaps
+    them; InMemoryDB.save() is lock-protected. If any upload fails its
+    exception (the first in input order) is raised once all have finished,
+    and every file that did upload is still persisted.
+    """
+    workers = min(8, (os.cpu_count() or 1) * 2)
+    try:
+        # submit + result() rather than pool.map(): map cancels the uploads
+        # still queued as soon as one fails, and they would be lost
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(upload_file, p, flush=False) for p in paths]
+        return [f.result() for f in futures]
+    finally:
+        get_db().flush()
+
+
+def store_stream(stream: BinaryIO, original_name: str, flush: bool = True) -> FileRecord:
+    """
+    Validate a client-supplied filename and stream `stream` into the uploads folder.
+    flush=False defers the DB write to the caller (as in upload_file).
+
+    Steps:
+      - validate file extension (before reading any data)
+      - ensure uploads/ exists
+      - stream into '<unique name>.part' in config.COPY_BUFSIZE chunks
+      - rename into place once complete (a partial upload is never visible)
+      - create & save FileRecord to in-memory DB
+
+    Raises:
+        InvalidFileTypeError
+        UploadError  (generic, user-safe wrapper; or raised by `stream` itself)
+    """
+    name = Path(original_name).name
+    part_path: Path | None = None
+    try:
+        raw_suffix = Path(name).suffix
+        suffix = raw_suffix.lower()
+        if not _is_allowed(suffix):
+            log.warning("blocked upload for disallowed file type: %s", name)
+            raise _disallowed_type_error(raw_suffix)
+
+        # ensure uploads dir exists
+        uploads_dir = _ensure_uploads_dir()
+
+        target_name = f"{os.urandom(16).hex()}{suffix}"
+        dest_path = uploads_dir / target_name
+        part_path = uploads_dir / f"{target_name}.part"
+
+        with open(part_path, "wb", buffering=config.COPY_BUFSIZE) as f:
+            shutil.copyfileobj(stream, f, length=config.COPY_BUFSIZE)
+            size_bytes = f.tell()
+        os.replace(part_path, dest_path)
+        part_path = None
+
+        record = FileRecord(
+            id=target_name,               # simple id = stored filename
+            original_name=name,
+            stored_path=dest_path,
+            size_bytes=size_bytes,
+        )
+
+        get_db().save(record, flush=flush)
+        if log.isEnabledFor(logging.INFO):
+            log.info("received upload '%s' as '%s' (%d bytes)",
+                     name, dest_path.name, size_bytes)
+        return record
+
+    except UploadError:
+        # already logged, or user-safe as is (e.g. a malformed request body)
+        raise
+
+    except Exception as exc:
+        log.exception("unexpected error while storing upload '%s'", name)
+        raise UploadError("Upload failed due to an unexpected error.") from exc
+
+    finally:
+        # best-effort cleanup of an unfinished upload
+        if part_path is not None:
+            try:
+                part_path.unlink(missing_ok=True)
+            except OSError:
+                pass
@@ -0,0 +1,65 @@
+"""
+Stdlib unittest for the streaming multipart/form-data reader.
+"""
+
+import io
+import unittest
+from unittest import mock
+
+from src.app import multipart
+from src.app.multipart import MultipartReader, parse_content_type
+from src.app.exceptions import MultipartError
+
+
+BOUNDARY = "----testboundary"
+
+
+def _body(*parts: tuple) -> bytes:
+    """Encode (name, filename, data) tuples as a multipart/form-data body."""
+    out = b"ignored preamble\r\n"
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename:
+            disposition += f'; filename="{filename}"'
+        out += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode()
+        out += data + b"\r\n"
+    return out + f"--{BOUNDARY}--\r\n".encode()
+
+
+class MultipartReaderTests(unittest.TestCase):
+    def _parts(self, raw: bytes) -> list:
+        reader = MultipartReader(io.BytesIO(raw), BOUNDARY, len(raw))
+        return [(p.name, p.filename, p.read()) for p in reader]
+
+    def test_parse_content_type(self):
+        ctype, boundary = parse_content_type(f'multipart/form-data; boundary="{BOUNDARY}"')
+        self.assertEqual(ctype, "multipart/form-data")
+        self.assertEqual(boundary, BOUNDARY)
+        self.assertIsNone(parse_content_type("text/plain")[1])
+
+    def test_reads_fields_and_file(self):
+        raw = _body(("note", None, b"hi"), ("file", "a.txt", b"line one\r\nline two\r\n"))
+        self.assertEqual(self._parts(raw), [
+            ("note", None, b"hi"),
+            ("file", "a.txt", b"line one\r\nline two\r\n"),
+        ])
+
+    def test_non_ascii_filename_is_utf8(self):
+        raw = _body(("file", "résumé.txt", b"x"))
+        self.assertEqual(self._parts(raw), [("file", "résumé.txt", b"x")])
+
+    def test_boundary_split_across_reads(self):
+        # dashes and CRLFs inside the data look like a partial delimiter
+        data = b"--\r\n-" * 50 + b"\r\n--" + b"-testboundar"
+        raw = _body(("file", "a.txt", data), ("after", None, b"x"))
+        with mock.patch.object(multipart, "_READ_SIZE", 3):
+            self.assertEqual(self._parts(raw), [("file", "a.txt", data), ("after", None, b"x")])
+
+    def test_missing_closing_boundary_raises(self):
+        raw = _body(("file", "a.txt", b"abc"))[:-20]
+        with self.assertRaises(MultipartError):
+            self._parts(raw)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -0,0 +1,91 @@
+"""
+Stdlib unittest for the HTTP server, run against a live ThreadingHTTPServer
+on an ephemeral port. Config paths are repointed into a temp directory as in
+test_upload_process.
+"""
+
+import http.client
+import json
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+from src.app import config, server
+import src.app.storage as storage
+
+
+BOUNDARY = "----servertestboundary"
+
+
+def _multipart(filename: str, data: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + data + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+class ServerTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        base = Path(cls.tmpdir.name)
+        config.UPLOADS_DIR = base / "uploads"
+        config.LOGS_DIR = base / "logs"
+        config.DATA_DIR = base / "data"
+        storage.reinit()
+
+        cls.httpd = ThreadingHTTPServer(("127.0.0.1", 0), server.Handler)
+        cls.thread = threading.Thread(target=cls.httpd.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+        storage.get_db().flush()
+        cls.tmpdir.cleanup()
+
+    def _post(self, body: bytes,
+              content_type: str = f"multipart/form-data; boundary={BOUNDARY}") -> tuple:
+        conn = http.client.HTTPConnection(*self.httpd.server_address, timeout=10)
+        try:
+            conn.request("POST", "/upload", body=body, headers={"Content-Type": content_type})
+            resp = conn.getresponse()
+            return resp.status, json.loads(resp.read())
+        finally:
+            conn.close()
+
+    def test_upload_returns_counts(self):
+        status, payload = self._post(_multipart("notes.txt", b"one two\nthree\n"))
+        self.assertEqual(status, 200)
+        self.assertEqual(payload["original_name"], "notes.txt")
+        self.assertEqual((payload["line_count"], payload["word_count"]), (2, 3))
+
+    def test_rejected_large_upload_gets_json_error(self):
+        # far larger than the socket buffers: the server must read it all
+        # before replying, or the client sees a reset instead of the 400
+        big = b"x" * (20 * 1024 * 1024)
+        status, payload = self._post(_multipart("a.pdf", big))
+        self.assertEqual(status, 400)
+        self.assertIn("not allowed", payload["error"])
+
+        status, payload = self._post(big, content_type="application/octet-stream")
+        self.assertEqual(status, 400)
+        self.assertEqual(payload["error"], "Use multipart/form-data")
+
+    def test_upload_writes_db_once(self):
+        # an elapsed interval must not add a flush on top of the request's own
+        with mock.patch.object(storage, "_FLUSH_INTERVAL", 0.0), \
+                mock.patch.object(storage.InMemoryDB, "_flush",
+                                  autospec=True, side_effect=storage.InMemoryDB._flush) as flush:
+            status, _ = self._post(_multipart("notes.txt", b"x\n"))
+        self.assertEqual(status, 200)
+        self.assertEqual(flush.call_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)
@@ -1,27 +1,34 @@
 """
 Stdlib unittest (no external deps).
 
-Sandbox by redirecting config paths to a temp directory for each test,
-and reloading the storage module so its singleton DB points at the temp data dir.
+Sandbox by redirecting config paths to a temp directory shared by the class;
+each test empties the uploads/data folders and calls storage.reinit() so the
+singleton DB starts empty and points at the temp data dir.
 """
 
-import importlib
+import contextlib
+import io
+import json
+import shutil
 import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
 
-from src.app import config
-from src.app.uploader import upload_file, is_allowed_file
+from src.app import cli, config, uploader
+from src.app.uploader import upload_file, upload_files_bulk, is_allowed_file, store_stream
 from src.app.exceptions import InvalidFileTypeError, FileAccessError
+from src.app import processor
 from src.app.processor import process_file
-import src.app.storage as storage  # we will reload this module after changing config paths
+import src.app.storage as storage
 
 
 class UploadProcessTests(unittest.TestCase):
-    def setUp(self) -> None:
-        # Create a temp workspace and repoint config paths into it
-        self.tmpdir = tempfile.TemporaryDirectory()
-        base = Path(self.tmpdir.name)
+    @classmethod
+    def setUpClass(cls) -> None:
+        # One temp workspace for the class; config paths are repointed into it
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        base = Path(cls.tmpdir.name)
 
         config.UPLOADS_DIR = base / "uploads"
         config.LOGS_DIR = base / "logs"
@@ -31,27 +38,33 @@ class UploadProcessTests(unittest.TestCase):
         config.LOGS_DIR.mkdir(parents=True, exist_ok=True)
         config.DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-        # IMPORTANT: reload storage so its module-level singleton `db` uses the new DATA_DIR
-        importlib.reload(storage)
-
-        # Build sample files inside the temp folder
-        self.sample_txt = base / "sample.txt"
-        self.sample_txt.write_text(
-            "Hello there!\nThis is a tiny sample text file.\nIt has three lines.",
-            encoding="utf-8"
+        # Build sample files inside the temp folder (tests only read them)
+        cls.sample_txt = base / "sample.txt"
+        cls.sample_txt.write_bytes(
+            b"Hello there!\nThis is a tiny sample text file.\nIt has three lines."
         )
 
-        self.sample_csv = base / "sample.csv"
-        self.sample_csv.write_text(
-            "name,age\nAlice,30\nBob,22\nCharlie,27\n",
-            encoding="utf-8"
-        )
+        cls.sample_csv = base / "sample.csv"
+        cls.sample_csv.write_bytes(b"name,age\nAlice,30\nBob,22\nCharlie,27\n")
 
-        self.bad_pdf = base / "report.pdf"
-        self.bad_pdf.write_bytes(b"%PDF-1.4 pretend-binary")
+        cls.bad_pdf = base / "report.pdf"
+        cls.bad_pdf.write_bytes(b"%PDF-1.4 pretend-binary")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.tmpdir.cleanup()
+
+    def setUp(self) -> None:
+        # Isolation: start every test with no stored uploads and an empty DB
+        for folder in (config.UPLOADS_DIR, config.DATA_DIR):
+            shutil.rmtree(folder)
+            folder.mkdir()
+        # IMPORTANT: re-point the singleton DB at DATA_DIR/db.json and drop old rows
+        storage.reinit()
 
     def tearDown(self) -> None:
-        self.tmpdir.cleanup()
+        # write batched saves now rather than at exit, after the dir is gone
+        storage.get_db().flush()
 
     # ---------- validation ----------
 
@@ -78,6 +91,37 @@ class UploadProcessTests(unittest.TestCase):
         self.assertTrue(rec.stored_path.exists())
         self.assertEqual(rec.status, "UPLOADED")
 
+    def test_upload_without_tmpfile_support_leaves_no_part_file(self):
+        # force the portable '.part' + os.replace route
+        with mock.patch.object(uploader, "_copy_tmpfile", return_value=None):
+            rec = upload_file(self.sample_txt)
+        self.assertEqual(rec.stored_path.read_bytes(), self.sample_txt.read_bytes())
+        self.assertEqual([p.name for p in config.UPLOADS_DIR.iterdir()], [rec.id])
+
+    def test_reupload_of_unchanged_file_reuses_record(self):
+        with mock.patch.object(config, "REUSE_UNCHANGED_UPLOADS", True):
+            rec = upload_file(self.sample_txt)
+            self.assertIs(upload_file(self.sample_txt), rec)
+            # once the stored copy is gone, the file is copied again
+            rec.stored_path.unlink()
+            self.assertNotEqual(upload_file(self.sample_txt).id, rec.id)
+        # the flag is off by default: every call copies
+        self.assertNotEqual(upload_file(self.sample_txt).id, upload_file(self.sample_txt).id)
+
+    def test_store_stream_writes_into_uploads(self):
+        rec = store_stream(io.BytesIO(b"streamed body\n"), "dir/notes.TXT")
+        self.assertTrue(rec.id.endswith(".txt"))
+        self.assertEqual(rec.original_name, "notes.TXT")
+        self.assertEqual(rec.stored_path.read_bytes(), b"streamed body\n")
+        self.assertEqual(rec.size_bytes, 14)
+        # nothing but the final file is left behind
+        self.assertEqual([p.name for p in config.UPLOADS_DIR.iterdir()], [rec.id])
+
+    def test_store_stream_disallowed_extension_raises(self):
+        with self.assertRaises(InvalidFileTypeError):
+            store_stream(io.BytesIO(b"x"), "report.pdf")
+        self.assertEqual(list(config.UPLOADS_DIR.iterdir()), [])
+
     def test_process_counts_and_status(self):
         rec = upload_file(self.sample_txt)
         rec2 = process_file(rec.id)
@@ -93,16 +137,82 @@ class UploadProcessTests(unittest.TestCase):
         # Our word counting is whitespace-based; each CSV line is a single token.
         self.assertEqual(rec2.word_count, 4)
 
+    def test_process_utf16_file(self):
+        utf16 = Path(self.tmpdir.name) / "wide.txt"
+        utf16.write_text("héllo wörld\nsecond line here\n", encoding="utf-16")
+        rec2 = process_file(upload_file(utf16).id)
+        self.assertEqual((rec2.line_count, rec2.word_count), (2, 5))
+        # transcoded slice by slice: odd slices split UTF-16 code units
+        with mock.patch.object(processor, "_COUNT_CHUNK_BYTES", 3):
+            rec3 = process_file(rec2.id)
+        self.assertEqual((rec3.line_count, rec3.word_count), (2, 5))
+
+    def test_process_bom_lookalike_counts_raw_bytes(self):
+        # latin-1 text that happens to start with the UTF-16 LE BOM ("ÿþ")
+        latin1 = Path(self.tmpdir.name) / "latin1.txt"
+        latin1.write_bytes("ÿþ abc\nline two!\n".encode("latin-1"))
+        rec2 = process_file(upload_file(latin1).id)
+        self.assertEqual((rec2.line_count, rec2.word_count), (2, 4))
+
+    def test_count_words_across_chunk_boundary(self):
+        data = b"alpha beta\r\ngamma  delta\nepsilon"
+        # tiny chunks force words to straddle slice boundaries
+        with mock.patch.object(processor, "_COUNT_CHUNK_BYTES", 4):
+            self.assertEqual(processor._count_lines_words(data), (3, 5))
+
     # ---------- persistence across processes simulation ----------
 
     def test_persistence_after_reload(self):
-        rec = upload_file(self.sample_txt)  # save() flushes to data/db.json
-        # Simulate a fresh process by reloading storage
-        importlib.reload(storage)
+        rec = upload_file(self.sample_txt)
+        # saves are batched; force the write a new process would read
+        storage.get_db().flush()
+        # Simulate a fresh process by reloading the DB from disk
+        storage.reinit()
         db2 = storage.db
         found = db2.get(rec.id)
         self.assertIsNotNone(found)
         self.assertEqual(found.original_name, "sample.txt")
+        self.assertEqual(int(found.uploaded_at.timestamp()), int(rec.uploaded_at.timestamp()))
+
+    def test_cli_writes_db_before_reporting_ok(self):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(cli.main(["upload", str(self.sample_txt)]), 0)
+        self.assertTrue(out.getvalue().startswith("OK:"))
+        # no flush() here: the record must already be on disk
+        rows = json.loads((config.DATA_DIR / "db.json").read_text(encoding="utf-8"))
+        self.assertEqual([r["original_name"] for r in rows], ["sample.txt"])
+
+    def test_explicit_db_json_path_overrides_data_dir(self):
+        custom = config.DATA_DIR / "custom.json"
+        with mock.patch.object(config, "DB_JSON_PATH", custom):
+            storage.reinit()
+            upload_file(self.sample_txt)
+            storage.get_db().flush()
+        self.assertTrue(custom.exists())
+        self.assertFalse((config.DATA_DIR / "db.json").exists())
+
+    def test_bulk_upload_persists_all_records(self):
+        recs = upload_files_bulk([self.sample_txt, self.sample_csv])
+        storage.reinit()
+        for rec in recs:
+            self.assertIsNotNone(storage.db.get(rec.id))
+
+    def test_bulk_upload_failure_keeps_other_records(self):
+        with self.assertRaises(InvalidFileTypeError):
+            upload_files_bulk([self.sample_txt, self.bad_pdf, self.sample_csv])
+        storage.reinit()
+        names = sorted(r.original_name for r in storage.db.all())
+        self.assertEqual(names, ["sample.csv", "sample.txt"])
+
+    def test_load_legacy_isoformat_timestamp(self):
+        (config.DATA_DIR / "db.json").write_text(
+            '[{"id": "old.txt", "original_name": "old.txt", "stored_path": "old.txt",'
+            ' "size_bytes": 1, "uploaded_at": "2024-05-01T12:00:00+00:00"}]',
+            encoding="utf-8"
+        )
+        storage.reinit()
+        found = storage.db.get("old.txt")
+        self.assertEqual(found.uploaded_at.isoformat(), "2024-05-01T12:00:00+00:00")
 
 
 if __name__ == "__main__":